@@ -1,6 +1,8 @@
+import numpy as np
+import pandas as pd
 import streamlit as st
 from math import sqrt
-from scipy.stats import norm
+from typing import NamedTuple
 
 # Inject custom CSS for nicer UI and larger text
 st.markdown(
@@ -8,513 +10,677 @@ st.markdown(
     <style>
     .big-font {font-size: 20px !important; }
     .header-font {font-size: 28px !important; font-weight: bold; }
-    .subheader-font {font-size: 24px !important; font-weight: bold; }
     </style>
     """,
     unsafe_allow_html=True
 )
 
+# The market and warehouse dicts, and the arrays derived from them, are kept in
+# st.session_state and only rebuilt after a widget group that feeds them changes.
+def _invalidate(*names):
+    for name in names:
+        st.session_state.pop(name, None)
+
+# Standard locations, used as both the base market areas and the base
+# warehouse locations.
+BASE_LOCATIONS = ["FL", "CA_SOUTH", "CA_NORTH", "TX", "NJ"]
+_BASE_LOCATIONS_SET = frozenset(BASE_LOCATIONS)
+
+# Standard locations followed by the new comma-separated custom entries, in
+# order. Cached on the raw text so it is only re-parsed when the input changes.
+@st.cache_data(show_spinner=False)
+def parse_areas(custom_str):
+    seen = set()
+    custom = []
+    for area in (a.strip() for a in custom_str.split(",")):
+        if area and area not in _BASE_LOCATIONS_SET and area not in seen:
+            seen.add(area)
+            custom.append(area)
+    return BASE_LOCATIONS + custom
+
 # =============================================================================
 # Global Parameters
 # =============================================================================
 st.markdown("<p class='header-font'>Supply Chain & Inventory Model Setup</p>", unsafe_allow_html=True)
 
-interest_rate = st.number_input(
-    "Actual Interest Rate (%)",
-    min_value=0.0,
-    max_value=100.0,
-    value=5.0,
-    step=0.1
-)
-
-service_level = st.slider(
-    "Required Service Level (0-1)",
-    min_value=0.0,
-    max_value=1.0,
-    value=0.95
-)
-
+# Parameter blocks are grouped in st.form so edits are batched and the script
+# reruns once per "Apply" instead of on every keystroke. The layout type stays
+# outside the forms because it changes which warehouse widgets are shown.
 layout_type = st.radio(
     "Layout Type",
-    options=["Central and Fronts", "Main Regionals"]
+    options=["Central and Fronts", "Main Regionals"],
+    on_change=_invalidate,
+    args=("warehouse_data", "warehouse_arrays")
 )
 
 if layout_type == "Main Regionals":
     st.info("Note: With 'Main Regionals', all warehouses must be of type MAIN.")
 
-# Note: Removed global shipping cost rate input.
-unit_cost = st.number_input(
-    "Unit (4 Panels) Cost (per unit, in $)",
-    min_value=0.0,
-    value=80.0,
-    step=1.0,
-)
+with st.form("global_params"):
+    interest_rate = st.number_input(
+        "Actual Interest Rate (%)",
+        min_value=0.0,
+        max_value=100.0,
+        value=5.0,
+        step=0.1
+    )
 
-# Calculate Z_value from service_level
-Z_value = norm.ppf(service_level)
+    service_level = st.slider(
+        "Required Service Level (0-1)",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.95,
+        step=0.01
+    )
 
-# =============================================================================
-# Rental Parameters
-# =============================================================================
-st.markdown("<p class='subheader-font'>Rental Parameters</p>", unsafe_allow_html=True)
-
-sq_ft_per_unit = st.number_input(
-    "Square feet required per unit (4 Panels) - (default 0.8)",
-    min_value=0.0,
-    value=0.8,
-    step=0.1,
-    format="%.1f"
-)
+    # Note: Removed global shipping cost rate input.
+    unit_cost = st.number_input(
+        "Unit (4 Panels) Cost (per unit, in $)",
+        min_value=0.0,
+        value=80.0,
+        step=1.0,
+    )
+    st.form_submit_button("Apply")
 
-overhead_factor_main = st.number_input(
-    "Overhead factor for MAIN warehouse (default 1.2)",
-    min_value=1.0,
-    value=1.2,
-    step=0.1,
-    format="%.1f"
-)
+# Calculate Z_value from service_level. The slider only yields a handful of
+# values; rounding the key keeps float noise from creating new cache entries.
+@st.cache_data(show_spinner=False)
+def z_from_service_level(sl):
+    # ndtri is the inverse normal CDF that norm.ppf dispatches to.
+    from scipy.special import ndtri
+    return float(ndtri(sl))
 
-overhead_factor_front = st.number_input(
-    "Overhead factor for FRONT warehouse (default 1.5)",
-    min_value=1.0,
-    value=1.5,
-    step=0.1,
-    format="%.1f"
-)
+Z_value = z_from_service_level(round(service_level, 4))
 
 # =============================================================================
-# Market Areas Setup
+# Rental Parameters
 # =============================================================================
-st.markdown("<p class='subheader-font'>Market Areas Setup</p>", unsafe_allow_html=True)
-
-base_market_areas = ["FL", "CA_SOUTH", "CA_NORTH", "TX", "NJ"]
-st.write("Standard market areas:", base_market_areas)
+st.subheader("Rental Parameters")
 
-custom_market_areas_str = st.text_input("Enter additional market areas (comma separated)", value="")
-custom_market_areas = [area.strip() for area in custom_market_areas_str.split(",") if area.strip() != ""]
+with st.form("rental_params"):
+    sq_ft_per_unit = st.number_input(
+        "Square feet required per unit (4 Panels) - (default 0.8)",
+        min_value=0.0,
+        value=0.8,
+        step=0.1,
+        format="%.1f"
+    )
 
-all_market_areas = list(dict.fromkeys(base_market_areas + custom_market_areas))
-selected_market_areas = st.multiselect("Select Market Areas to use", options=all_market_areas, default=all_market_areas)
+    overhead_factor_main = st.number_input(
+        "Overhead factor for MAIN warehouse (default 1.2)",
+        min_value=1.0,
+        value=1.2,
+        step=0.1,
+        format="%.1f"
+    )
 
-market_area_data = {}
-for area in selected_market_areas:
-    st.markdown(f"<p class='big-font'>Parameters for Market Area: {area}</p>", unsafe_allow_html=True)
-    avg_order_size = st.number_input(
-        f"Average Order Size for {area}",
-        min_value=0,
-        value=100,
-        step=1,
-        format="%d",
-        key=f"{area}_order_size"
+    overhead_factor_front = st.number_input(
+        "Overhead factor for FRONT warehouse (default 1.5)",
+        min_value=1.0,
+        value=1.5,
+        step=0.1,
+        format="%.1f"
     )
-    avg_daily_demand = st.number_input(
-        f"Average Daily Demand for {area}",
-        min_value=0,
-        value=50,
-        step=1,
-        format="%d",
-        key=f"{area}_daily_demand"
+    st.form_submit_button("Apply")
+
+# =============================================================================
+# Market Areas Setup
+# =============================================================================
+# Whole-unit market inputs are stored in int32 arrays, so their widgets are
+# capped at the int32 range.
+INT32_MAX = int(np.iinfo(np.int32).max)
+
+# Per-area number inputs: (data field, label, widget key suffix, widget kwargs).
+MARKET_FIELDS = (
+    ("avg_order_size", "Average Order Size", "order_size", dict(min_value=0, max_value=INT32_MAX, value=100, step=1, format="%d")),
+    ("avg_daily_demand", "Average Daily Demand", "daily_demand", dict(min_value=0, max_value=INT32_MAX, value=50, step=1, format="%d")),
+    ("std_daily_demand", "Standard Deviation of Daily Demand", "std_demand", dict(min_value=0.0, value=10.0)),
+)
+FORECAST_COLUMNS = [f"Month {m+1}" for m in range(12)]
+
+# Renders the market area inputs into the current container and returns the
+# selected areas with their data: {area: {avg_order_size, avg_daily_demand,
+# std_daily_demand, forecast_demand}}.
+def render_market_areas():
+    st.subheader("Market Areas Setup")
+
+    st.write("Standard market areas:", BASE_LOCATIONS)
+
+    custom_market_areas_str = st.text_input("Enter additional market areas (comma separated)", value="")
+    all_market_areas = parse_areas(custom_market_areas_str)
+    selected_market_areas = st.multiselect("Select Market Areas to use", options=all_market_areas, default=all_market_areas)
+
+    area_params = {}
+    for area in selected_market_areas:
+        st.markdown(f"<p class='big-font'>Parameters for Market Area: {area}</p>", unsafe_allow_html=True)
+        area_params[area] = {
+            field: st.number_input(f"{label} for {area}", key=f"{area}_{key_suffix}", **widget_kwargs)
+            for field, label, key_suffix, widget_kwargs in MARKET_FIELDS
+        }
+
+    # One editable (areas x 12 months) grid instead of 12 number inputs per
+    # area. Submitted values are remembered per area name and seed the grid, so
+    # they survive changes to the selected areas. The seed is only rebuilt when
+    # the selection changes: the editor's identity follows its seed data, and
+    # re-seeding after every Apply would drop the next submit from the grid.
+    st.markdown("<p class='big-font'>12-month Forecast Demand</p>", unsafe_allow_html=True)
+    st.write("Enter the forecast demand for each market area (each value as a whole number)")
+    saved_forecasts = st.session_state.setdefault("forecast_values", {})
+    forecast_seed = st.session_state.get("forecast_seed")
+    if forecast_seed is None or list(forecast_seed.index) != selected_market_areas:
+        if forecast_seed is not None:
+            # Fold grid edits submitted together with the area change into the
+            # saved values before the old grid state is discarded.
+            edited_rows = st.session_state.get("forecast_grid", {}).get("edited_rows", {})
+            for row, edits in edited_rows.items():
+                area = forecast_seed.index[int(row)]
+                values = forecast_seed.loc[area].tolist()
+                for column, value in edits.items():
+                    values[FORECAST_COLUMNS.index(column)] = int(value or 0)
+                saved_forecasts[area] = values
+        st.session_state.pop("forecast_grid", None)
+        forecast_seed = st.session_state["forecast_seed"] = pd.DataFrame(
+            [saved_forecasts.get(area, [0] * 12) for area in selected_market_areas],
+            index=selected_market_areas,
+            columns=FORECAST_COLUMNS,
+        )
+    forecast_grid = st.data_editor(
+        forecast_seed,
+        key="forecast_grid",
+        num_rows="fixed",
+        column_config={
+            column: st.column_config.NumberColumn(min_value=0, max_value=INT32_MAX, step=1, format="%d")
+            for column in FORECAST_COLUMNS
+        },
     )
-    std_daily_demand = st.number_input(
-        f"Standard Deviation of Daily Demand for {area}",
-        min_value=0.0,
-        value=10.0,
-        key=f"{area}_std_demand"
+    forecast_values = forecast_grid.fillna(0).astype(int).to_numpy()
+    saved_forecasts.update(zip(selected_market_areas, forecast_values.tolist()))
+
+    zero_months = forecast_values == 0
+    for area, area_zero_months in zip(selected_market_areas, zero_months):
+        if area_zero_months.any():
+            zero_demand_months = (np.flatnonzero(area_zero_months) + 1).tolist()
+            st.warning(f"In market area {area}, forecast demand for months {zero_demand_months} is 0. Please verify if this is intentional.")
+
+    market_area_data = st.session_state.get("market_area_data")
+    if market_area_data is None:
+        market_area_data = {
+            area: {**area_params[area], "forecast_demand": forecast_demand}
+            for area, forecast_demand in zip(selected_market_areas, forecast_values.tolist())
+        }
+        st.session_state["market_area_data"] = market_area_data
+    return selected_market_areas, market_area_data
+
+# Market areas and warehouses share one form: the warehouse inputs depend on
+# the selected market areas, and a single Apply reruns the script once.
+setup_form = st.form("setup_form")
+with setup_form:
+    selected_market_areas, market_area_data = render_market_areas()
+
+market_arrays = st.session_state.get("market_arrays")
+if market_arrays is None:
+    # Forecasts stacked into a (markets x 12) matrix with a name -> row index, so
+    # per-warehouse monthly and annual totals are single NumPy reductions. The
+    # whole-unit forecasts fit in int32; the reductions accumulate in int64.
+    area_index = {area: row for row, area in enumerate(market_area_data)}
+    forecast_matrix = np.array(
+        [d["forecast_demand"] for d in market_area_data.values()], dtype=np.int32
+    ).reshape(-1, 12)
+    annual_forecast_by_area = forecast_matrix.sum(axis=1, dtype=np.int64)
+
+    # The remaining per-area inputs as column vectors in the same row order
+    # (structure-of-arrays), so calculations index by row instead of by name.
+    # Whole-unit inputs are int32; the std stays float64 as safety stock is
+    # reported to the cent.
+    daily_demand_vec = np.array([d["avg_daily_demand"] for d in market_area_data.values()], dtype=np.int32)
+    std_daily_demand_vec = np.array([d["std_daily_demand"] for d in market_area_data.values()], dtype=float)
+    order_size_vec = np.array([d["avg_order_size"] for d in market_area_data.values()], dtype=np.int32)
+    market_arrays = st.session_state["market_arrays"] = (
+        area_index, forecast_matrix, annual_forecast_by_area, daily_demand_vec, std_daily_demand_vec, order_size_vec
     )
-    
-    st.write(f"Enter 12-month Forecast Demand for {area} (each value as a whole number)")
-    forecast_demand = []
-    cols = st.columns(4)
-    zero_demand_months = []
-    for m in range(12):
-        col = cols[m % 4]
-        value = col.number_input(
-            f"Month {m+1}",
-            min_value=0,
-            value=0,
-            step=1,
-            format="%d",
-            key=f"{area}_forecast_{m}"
-        )
-        if value == 0:
-            zero_demand_months.append(m+1)
-        forecast_demand.append(value)
-    
-    if zero_demand_months:
-        st.warning(f"In market area {area}, forecast demand for months {zero_demand_months} is 0. Please verify if this is intentional.")
-    
-    if len(forecast_demand) != 12:
-        st.error(f"Forecast demand for {area} must have exactly 12 values.")
-    
-    market_area_data[area] = {
-        "avg_order_size": avg_order_size,
-        "avg_daily_demand": avg_daily_demand,
-        "std_daily_demand": std_daily_demand,
-        "forecast_demand": forecast_demand,
-    }
+area_index, forecast_matrix, annual_forecast_by_area, daily_demand_vec, std_daily_demand_vec, order_size_vec = market_arrays
 
 # =============================================================================
 # Warehouse Setup
 # =============================================================================
-st.markdown("<p class='subheader-font'>Warehouse Setup</p>", unsafe_allow_html=True)
-
-base_warehouse_locations = ["FL", "CA_SOUTH", "CA_NORTH", "TX", "NJ"]
-st.write("Standard warehouse locations:", base_market_areas)
-
-custom_warehouse_locations_str = st.text_input("Enter additional warehouse locations (comma separated)", value="")
-custom_warehouse_locations = [loc.strip() for loc in custom_warehouse_locations_str.split(",") if loc.strip() != ""]
-all_warehouse_locations = list(dict.fromkeys(base_warehouse_locations + custom_warehouse_locations))
-
-num_warehouses = st.number_input("Number of Warehouses", min_value=1, value=1, step=1)
-
-warehouse_data = []
-for i in range(int(num_warehouses)):
-    st.markdown(f"<p class='big-font'>Warehouse {i+1}</p>", unsafe_allow_html=True)
-    location = st.selectbox(f"Select Location for Warehouse {i+1}", options=all_warehouse_locations, key=f"wh_location_{i}")
-    
-    if layout_type == "Main Regionals":
-        wh_type = "MAIN"
-        st.write("Warehouse Type: MAIN (Only MAIN allowed for Main Regionals layout)")
-    else:
-        wh_type = st.radio(f"Select Warehouse Type for Warehouse {i+1}", options=["MAIN", "FRONT"], key=f"wh_type_{i}")
-    
-    served_markets = st.multiselect(f"Select Market Areas served by Warehouse {i+1}", options=selected_market_areas, key=f"wh_markets_{i}")
-    
-    if location not in served_markets:
-        st.error(f"Warehouse {i+1} location '{location}' must be included in its served market areas!")
-    
-    rent_pricing_method = st.radio(f"Select Rent Pricing Method for Warehouse {i+1} (Price per Year)", options=["Fixed Rent Price", "Square Foot Rent Price"], key=f"rent_method_{i}")
-    if rent_pricing_method == "Fixed Rent Price":
-        rent_price = st.number_input(f"Enter Fixed Rent Price (per year, in $) for Warehouse {i+1}", min_value=0.0, value=1000.0, step=1.0, format="%.0f", key=f"fixed_rent_{i}")
-    else:
-        rent_price = st.number_input(f"Enter Rent Price per Square Foot (per year, in $) for Warehouse {i+1}", min_value=0.0, value=10.0, step=1.0, format="%.0f", key=f"sqft_rent_{i}")
-    
-    avg_employee_salary = st.number_input(f"Enter Average Annual Salary per Employee for Warehouse {i+1} (in $)", min_value=0, value=50000, step=1000, format="%d", key=f"employee_salary_{i}")
-    
-    # Labor: number of employees with defaults:
-    if wh_type == "MAIN":
-        default_emp = 3 if len(served_markets) == 1 else 4
-    else:
-        default_emp = 2
-    num_employees = st.number_input(f"Enter Number of Employees for Warehouse {i+1}", min_value=0, value=default_emp, step=1, key=f"num_employees_{i}")
-    
-    # For MAIN warehouses in Main Regionals: If they serve more than one market,
-    # require input for additional distance and shipping cost for each additional market.
-    land_shipping_data = {}
-    if wh_type == "MAIN" and layout_type == "Main Regionals" and len(served_markets) > 1:
-        st.markdown(f"<p class='big-font'>Additional Land Shipping Inputs for Warehouse {i+1} (Main Regionals)</p>", unsafe_allow_html=True)
-        # Assume the first market is primary; for each additional market, require:
-        for add_area in served_markets[1:]:
-            distance_label = f"Distance (miles) from warehouse {location} to area {add_area}"
-            distance_val = st.number_input(distance_label, min_value=0.0, value=0.0, step=0.1, format="%.1f", key=f"dist_{i}_{add_area}")
-            
-            # Show user the avg_order_size for this area:
-            area_aos = market_area_data[add_area]["avg_order_size"]
-            cost_label = f"Shipping cost per average order of {area_aos} units per mile for area {add_area}"
-            cost_val = st.number_input(cost_label, min_value=0.0, value=0.0, step=0.1, format="%.2f", key=f"cost_{i}_{add_area}")
-            # If cost_val is 0, we signal an error
-            if cost_val == 0:
-                st.error(f"Please enter a non-zero shipping cost for average order for area {add_area} in warehouse {location}.")
-            
-            land_shipping_data[add_area] = {
-                "distance": distance_val,
-                "cost_for_avg_order_per_mile": cost_val
-            }
-    
-    wh_dict = {
-        "location": location,
-        "type": wh_type,
-        "served_markets": served_markets,
-        "rent_pricing_method": rent_pricing_method,
-        "rent_price": rent_price,
-        "avg_employee_salary": avg_employee_salary,
-        "num_employees": num_employees,
-    }
-    if land_shipping_data:
-        wh_dict["land_shipping_data"] = land_shipping_data
-    
-    if wh_type == "MAIN":
-        lt_shipping = st.number_input(f"Enter Lead Time (days) for shipping from Israel to Warehouse {i+1} (MAIN)", min_value=0, value=5, step=1, format="%d", key=f"lt_shipping_{i}")
-        shipping_cost_40hc = st.number_input(f"Enter Shipping Cost for a 40HC container (per container, in $) from Israel to Warehouse {i+1} (MAIN)", min_value=0, value=2000, step=1, format="%d", key=f"shipping_cost_40hc_{i}")
-        wh_dict["lt_shipping"] = lt_shipping
-        wh_dict["shipping_cost_40hc"] = shipping_cost_40hc
-    elif wh_type == "FRONT":
-        front_shipping_cost_40 = st.number_input(f"Enter Shipping Cost from MAIN warehouse to Warehouse {i+1} (FRONT) for a 40ft HC container (in $)", min_value=0, value=500, step=1, format="%d", key=f"front_shipping_cost_40_{i}")
-        front_shipping_cost_53 = st.number_input(f"Enter Shipping Cost from MAIN warehouse to Warehouse {i+1} (FRONT) for a 53ft HC container (in $)", min_value=0, value=600, step=1, format="%d", key=f"front_shipping_cost_53_{i}")
-        wh_dict["front_shipping_cost_40"] = front_shipping_cost_40
-        wh_dict["front_shipping_cost_53"] = front_shipping_cost_53
-        
-        main_wh_options = []
-        main_wh_mapping = {}
-        for j, w in enumerate(warehouse_data):
-            if w["type"] == "MAIN":
-                option_str = f"Warehouse {j+1} - {w['location']}"
-                main_wh_options.append(option_str)
-                main_wh_mapping[option_str] = j
-        if main_wh_options:
-            serving_central = st.selectbox(f"Select the MAIN warehouse serving Warehouse {i+1} (FRONT)", options=main_wh_options, key=f"serving_central_{i}")
-            wh_dict["serving_central"] = serving_central
-            main_wh_index = main_wh_mapping.get(serving_central)
-            if main_wh_index is not None:
-                main_wh = warehouse_data[main_wh_index]
-                common_markets = set(main_wh["served_markets"]).intersection(set(served_markets))
-                if not common_markets:
-                    st.error(f"Selected MAIN warehouse for Warehouse {i+1} does not serve any of its market areas!")
+with setup_form:
+    st.subheader("Warehouse Setup")
+
+    st.write("Standard warehouse locations:", BASE_LOCATIONS)
+
+    custom_warehouse_locations_str = st.text_input("Enter additional warehouse locations (comma separated)", value="")
+    all_warehouse_locations = parse_areas(custom_warehouse_locations_str)
+
+    num_warehouses = st.number_input("Number of Warehouses", min_value=1, value=1, step=1)
+
+    warehouse_data = st.session_state.get("warehouse_data")
+    rebuild_warehouse_data = warehouse_data is None
+    if rebuild_warehouse_data:
+        warehouse_data = []
+    # MAIN warehouses defined so far, offered as serving warehouses to later
+    # FRONT warehouses; extended as the loop goes instead of rescanned.
+    main_wh_options = []
+    main_wh_mapping = {}  # option label -> warehouse index
+    main_served_sets = {}  # warehouse index -> frozenset of markets served by that MAIN
+    # Only "Central and Fronts" has FRONT warehouses; in "Main Regionals" the
+    # FRONT-only widgets and MAIN/FRONT cross-checks are skipped entirely.
+    main_regionals = layout_type == "Main Regionals"
+    for i in range(int(num_warehouses)):
+        st.markdown(f"<p class='big-font'>Warehouse {i+1}</p>", unsafe_allow_html=True)
+        location = st.selectbox(f"Select Location for Warehouse {i+1}", options=all_warehouse_locations, key=f"wh_location_{i}")
+
+        if main_regionals:
+            wh_type = "MAIN"
+            st.write("Warehouse Type: MAIN (Only MAIN allowed for Main Regionals layout)")
+        else:
+            wh_type = st.radio(f"Select Warehouse Type for Warehouse {i+1}", options=["MAIN", "FRONT"], key=f"wh_type_{i}")
+
+        served_markets = st.multiselect(f"Select Market Areas served by Warehouse {i+1}", options=selected_market_areas, key=f"wh_markets_{i}")
+        served_markets_set = frozenset(served_markets)
+
+        if location not in served_markets_set:
+            st.error(f"Warehouse {i+1} location '{location}' must be included in its served market areas!")
+
+        rent_pricing_method = st.radio(f"Select Rent Pricing Method for Warehouse {i+1} (Price per Year)", options=["Fixed Rent Price", "Square Foot Rent Price"], key=f"rent_method_{i}")
+        if rent_pricing_method == "Fixed Rent Price":
+            rent_price = st.number_input(f"Enter Fixed Rent Price (per year, in $) for Warehouse {i+1}", min_value=0.0, value=1000.0, step=1.0, format="%.0f", key=f"fixed_rent_{i}")
         else:
-            st.error(f"No MAIN warehouse available to serve Warehouse {i+1} (FRONT). Please define a MAIN warehouse first.")
-            wh_dict["serving_central"] = None
-    warehouse_data.append(wh_dict)
+            rent_price = st.number_input(f"Enter Rent Price per Square Foot (per year, in $) for Warehouse {i+1}", min_value=0.0, value=10.0, step=1.0, format="%.0f", key=f"sqft_rent_{i}")
+
+        avg_employee_salary = st.number_input(f"Enter Average Annual Salary per Employee for Warehouse {i+1} (in $)", min_value=0, value=50000, step=1000, format="%d", key=f"employee_salary_{i}")
+
+        # Labor: number of employees with defaults:
+        if wh_type == "MAIN":
+            default_emp = 3 if len(served_markets) == 1 else 4
+        else:
+            default_emp = 2
+        num_employees = st.number_input(f"Enter Number of Employees for Warehouse {i+1}", min_value=0, value=default_emp, step=1, format="%d", key=f"num_employees_{i}")
+
+        # For MAIN warehouses in Main Regionals: If they serve more than one market,
+        # require input for additional distance and shipping cost for each additional market.
+        land_shipping_data = {}
+        if main_regionals and len(served_markets) > 1:
+            st.markdown(f"<p class='big-font'>Additional Land Shipping Inputs for Warehouse {i+1} (Main Regionals)</p>", unsafe_allow_html=True)
+            # Assume the first market is primary; for each additional market, require:
+            for add_area in served_markets[1:]:
+                distance_label = f"Distance (miles) from warehouse {location} to area {add_area}"
+                distance_val = st.number_input(distance_label, min_value=0.0, value=0.0, step=0.1, format="%.1f", key=f"dist_{i}_{add_area}")
+
+                # Show user the avg_order_size for this area:
+                area_aos = market_area_data[add_area]["avg_order_size"]
+                cost_label = f"Shipping cost per average order of {area_aos} units per mile for area {add_area}"
+                cost_val = st.number_input(cost_label, min_value=0.0, value=0.0, step=0.1, format="%.2f", key=f"cost_{i}_{add_area}")
+                # If cost_val is 0, we signal an error
+                if cost_val == 0:
+                    st.error(f"Please enter a non-zero shipping cost for average order for area {add_area} in warehouse {location}.")
+
+                land_shipping_data[add_area] = {
+                    "distance": distance_val,
+                    "cost_for_avg_order_per_mile": cost_val
+                }
+
+        wh_dict = {
+            "location": location,
+            "type": wh_type,
+            "served_markets": served_markets,
+            "rent_pricing_method": rent_pricing_method,
+            "rent_price": rent_price,
+            "avg_employee_salary": avg_employee_salary,
+            "num_employees": num_employees,
+        }
+        if land_shipping_data:
+            wh_dict["land_shipping_data"] = land_shipping_data
+
+        if wh_type == "MAIN":
+            lt_shipping = st.number_input(f"Enter Lead Time (days) for shipping from Israel to Warehouse {i+1} (MAIN)", min_value=0, value=5, step=1, format="%d", key=f"lt_shipping_{i}")
+            shipping_cost_40hc = st.number_input(f"Enter Shipping Cost for a 40HC container (per container, in $) from Israel to Warehouse {i+1} (MAIN)", min_value=0, value=2000, step=1, format="%d", key=f"shipping_cost_40hc_{i}")
+            wh_dict["lt_shipping"] = lt_shipping
+            wh_dict["shipping_cost_40hc"] = shipping_cost_40hc
+        elif wh_type == "FRONT":
+            front_shipping_cost_40 = st.number_input(f"Enter Shipping Cost from MAIN warehouse to Warehouse {i+1} (FRONT) for a 40ft HC container (in $)", min_value=0, value=500, step=1, format="%d", key=f"front_shipping_cost_40_{i}")
+            front_shipping_cost_53 = st.number_input(f"Enter Shipping Cost from MAIN warehouse to Warehouse {i+1} (FRONT) for a 53ft HC container (in $)", min_value=0, value=600, step=1, format="%d", key=f"front_shipping_cost_53_{i}")
+            wh_dict["front_shipping_cost_40"] = front_shipping_cost_40
+            wh_dict["front_shipping_cost_53"] = front_shipping_cost_53
+
+            if main_wh_options:
+                serving_central = st.selectbox(f"Select the MAIN warehouse serving Warehouse {i+1} (FRONT)", options=main_wh_options, key=f"serving_central_{i}")
+                wh_dict["serving_central"] = serving_central
+                main_wh_index = main_wh_mapping.get(serving_central)
+                if main_wh_index is not None:
+                    # isdisjoint stops at the first shared market without
+                    # building the intersection.
+                    if main_served_sets[main_wh_index].isdisjoint(served_markets_set):
+                        st.error(f"Selected MAIN warehouse for Warehouse {i+1} does not serve any of its market areas!")
+            else:
+                st.error(f"No MAIN warehouse available to serve Warehouse {i+1} (FRONT). Please define a MAIN warehouse first.")
+                wh_dict["serving_central"] = None
+        if wh_type == "MAIN" and not main_regionals:
+            option_str = f"Warehouse {i+1} - {location}"
+            main_wh_options.append(option_str)
+            main_wh_mapping[option_str] = i
+            main_served_sets[i] = served_markets_set
+        if rebuild_warehouse_data:
+            warehouse_data.append(wh_dict)
+    if rebuild_warehouse_data:
+        st.session_state["warehouse_data"] = warehouse_data
+    st.form_submit_button("Apply", on_click=_invalidate, args=("market_area_data", "market_arrays", "warehouse_data", "warehouse_arrays"))
+
+warehouse_arrays = st.session_state.get("warehouse_arrays")
+if warehouse_arrays is None:
+    # Row indices of each warehouse's served markets in the market arrays; kept
+    # here rather than in the user-facing warehouse dicts.
+    wh_rows = [tuple(area_index[a] for a in wh["served_markets"] if a in area_index) for wh in warehouse_data]
+    # Warehouses bucketed by type once, paired with their market rows, for
+    # reuse by every calculation section.
+    mains = [(wh, rows) for wh, rows in zip(warehouse_data, wh_rows) if wh["type"] == "MAIN"]
+    fronts = [(wh, rows) for wh, rows in zip(warehouse_data, wh_rows) if wh["type"] == "FRONT"]
+
+    # Warehouse x market boolean matrix of served markets, shared by validation
+    # and the per-warehouse aggregates.
+    served_mask = np.zeros((len(warehouse_data), len(area_index)), dtype=bool)
+    for row, rows in enumerate(wh_rows):
+        served_mask[row, list(rows)] = True
+    is_main = np.array([wh["type"] == "MAIN" for wh in warehouse_data], dtype=bool)
+    sqrt_lt_vec = np.array([sqrt(wh.get("lt_shipping", 0)) for wh in warehouse_data], dtype=float)
+    warehouse_arrays = st.session_state["warehouse_arrays"] = (mains, fronts, served_mask, is_main, sqrt_lt_vec)
+mains, fronts, served_mask, is_main, sqrt_lt_vec = warehouse_arrays
 
 # =============================================================================
 # Additional Validation
 # =============================================================================
-st.markdown("<p class='subheader-font'>Validation</p>", unsafe_allow_html=True)
-market_not_served = []
-for market in selected_market_areas:
-    served = any(market in wh["served_markets"] for wh in warehouse_data)
-    if not served:
-        market_not_served.append(market)
+st.subheader("Validation")
+market_not_served = [area for area, served in zip(area_index, served_mask.any(axis=0)) if not served]
 if market_not_served:
     st.error(f"The following market areas are not served by any warehouse: {', '.join(market_not_served)}")
 
 # =============================================================================
-# Helper Functions for Rental Calculation
+# Helper Functions for Cost Calculations
 # =============================================================================
-
-def compute_safety_stock_main(warehouse, layout):
-    std_sum = 0.0
-    for area in warehouse["served_markets"]:
-        if area in market_area_data:
-            std_sum += market_area_data[area]["std_daily_demand"]
+# Helpers are cached on their (hashable) inputs so that Streamlit reruns with
+# unchanged inputs skip the per-market loops entirely. The market arrays are
+# hashed by content, so they act as the market fingerprint; entries expire
+# after a day so old scenarios do not pile up in the server cache.
+CACHE_TTL = 24 * 60 * 60
+
+# Per-warehouse demand aggregates shared by the rental and inventory financing
+# sections; safety stock is 0 for FRONT warehouses.
+class Aggregates(NamedTuple):
+    is_main: np.ndarray
+    std_per_wh: np.ndarray
+    annual_per_wh: np.ndarray
+    daily_per_wh: np.ndarray
+    max_monthly_per_wh: np.ndarray
+    safety_stock_per_wh: np.ndarray
+
+# One vectorized pass over the warehouse x market mask, cached on its inputs so
+# whichever section is clicked first warms it for the others.
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def compute_aggregates(served_mask, is_main, sqrt_lt, forecast_matrix, annual_forecast_by_area,
+                       std_daily_demand_vec, daily_demand_vec, layout, z_value):
+    # Integer sums over the int32 inputs accumulate in int64 so they cannot wrap.
+    served_int64 = served_mask.astype(np.int64)
+    std_per_wh = served_mask @ std_daily_demand_vec
+    daily_per_wh = served_int64 @ daily_demand_vec
+    annual_per_wh = (served_mask @ annual_forecast_by_area).astype(float)
+    max_monthly_per_wh = (served_int64 @ forecast_matrix).max(axis=1).astype(float)
+    # Lead-time safety stock only for warehouses with a non-zero lead time;
+    # the rest (and FRONT warehouses) contribute 0, even when Z is infinite.
+    has_lead_time = sqrt_lt > 0
+    safety_stock_main = np.zeros(len(sqrt_lt))
+    safety_stock_main[has_lead_time] = std_per_wh[has_lead_time] * sqrt_lt[has_lead_time] * z_value
     if layout == "Central and Fronts":
-        front_daily_demand = 0.0
-        for wh in warehouse_data:
-            if wh["type"] == "FRONT":
-                front_daily_demand += sum(
-                    market_area_data[a]["avg_daily_demand"]
-                    for a in wh["served_markets"]
-                    if a in market_area_data
-                )
-        safety_stock_main = std_sum * sqrt(warehouse.get("lt_shipping", 0)) * Z_value
-        safety_stock_main += 12 * front_daily_demand
-    else:
-        LT = warehouse.get("lt_shipping", 0)
-        safety_stock_main = std_sum * sqrt(LT) * Z_value
-    return safety_stock_main
-
-def compute_max_monthly_forecast(warehouse):
-    max_monthly = 0
-    for m in range(12):
-        month_sum = 0
-        for area in warehouse["served_markets"]:
-            if area in market_area_data:
-                month_sum += market_area_data[area]["forecast_demand"][m]
-        if month_sum > max_monthly:
-            max_monthly = month_sum
-    return max_monthly
-
-def compute_daily_demand_sum(warehouse):
-    return sum(
-        market_area_data[a]["avg_daily_demand"]
-        for a in warehouse["served_markets"]
-        if a in market_area_data
+        # Total daily demand served by FRONT warehouses, held by the MAIN.
+        safety_stock_main += 12 * int(daily_per_wh[~is_main].sum())
+    safety_stock_per_wh = np.where(is_main, safety_stock_main, 0.0)
+    return Aggregates(is_main, std_per_wh, annual_per_wh, daily_per_wh, max_monthly_per_wh, safety_stock_per_wh)
+
+def rental_kernel(rent_price, sq_ft_per_unit, overhead, total_units, fixed):
+    # Vectorized over warehouses. Fixed-rent warehouses pay their rent price
+    # and have no computed area; the rest pay rent per square foot of area.
+    area = np.where(fixed, 0.0, sq_ft_per_unit * overhead * total_units)
+    cost = np.where(fixed, rent_price, rent_price * area)
+    return cost, area
+
+# The per-section calculations below are pure functions of hashable inputs
+# (tuples of warehouse fields plus the market arrays), cached so that repeated
+# clicks and unrelated edits reuse the previous result.
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def compute_rental_costs(warehouse_rows, aggregates, sq_ft_per_unit, overhead_main, overhead_front):
+    # warehouse_rows: (fixed_rent, rent_price) per warehouse.
+    fixed, rent_price = zip(*warehouse_rows)
+    is_main = aggregates.is_main
+    total_units = np.where(
+        is_main,
+        aggregates.max_monthly_per_wh + aggregates.safety_stock_per_wh,
+        (aggregates.max_monthly_per_wh / 4.0) + (aggregates.daily_per_wh * 12.0),
     )
+    overhead = np.where(is_main, overhead_main, overhead_front)
+    cost, area = rental_kernel(np.array(rent_price, dtype=float), sq_ft_per_unit, overhead, total_units, np.array(fixed))
+    return cost.tolist(), area.tolist()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def compute_inventory_financing(aggregates, layout, interest_rate, unit_cost):
+    # With "Central and Fronts" only the first MAIN warehouse holds the inventory.
+    main_idx = np.flatnonzero(aggregates.is_main)
+    if layout == "Central and Fronts":
+        main_idx = main_idx[:1]
+    total_safety_stock = float(aggregates.safety_stock_per_wh[main_idx].sum())
+    total_avg_inventory = float((aggregates.annual_per_wh[main_idx] / 12.0).sum()) + total_safety_stock
+    financing_cost = total_avg_inventory * 1.08 * (interest_rate / 100.0) * unit_cost
+    return total_safety_stock, total_avg_inventory, financing_cost
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def compute_shipping_costs(main_rows, front_rows, annual_forecast_by_area, order_size_vec, layout, container_capacity_40):
+    # main_rows: (location, market_rows, shipping_cost_40hc, land_rows) per MAIN warehouse, where land_rows
+    # is ((area, market_row, distance, cost_for_avg_order_per_mile), ...) for each additional served market.
+    # front_rows: (market_rows, front_shipping_cost_40, front_shipping_cost_53) per FRONT warehouse.
+    # Returns (sea cost, land cost, [(area, location)] with missing land shipping inputs).
+    total_sea_shipping_cost = 0.0
+    total_land_shipping_cost = 0.0
+    missing_inputs = []
+
+    # --- Sea Shipping Cost ---
+    sea_rows = main_rows[:1] if layout == "Central and Fronts" else main_rows
+    for _, rows, shipping_cost_40hc, _ in sea_rows:
+        if rows:
+            containers = float(annual_forecast_by_area[list(rows)].sum()) / container_capacity_40
+            total_sea_shipping_cost += containers * shipping_cost_40hc
+
+    # --- Land Shipping Cost ---
+    if layout == "Central and Fronts":
+        # For each FRONT warehouse:
+        for rows, front_shipping_cost_40, front_shipping_cost_53 in front_rows:
+            cost_40_unit = front_shipping_cost_40 / container_capacity_40
+            cost_53_unit = front_shipping_cost_53 / (container_capacity_40 * 1.37)
+            avg_cost_unit = (cost_40_unit + cost_53_unit) / 2.0
+            normalized_cost = avg_cost_unit / 0.85
+            # Weekly cost is (monthly / 4) * normalized_cost, paid 4 times a
+            # month, so over 12 months this is just annual demand * cost.
+            served_annual = float(annual_forecast_by_area[list(rows)].sum())
+            total_land_shipping_cost += served_annual * normalized_cost
+    elif layout == "Main Regionals":
+        # For each MAIN warehouse serving multiple markets:
+        for location, _, _, land_rows in main_rows:
+            for area, row, distance, cost_for_avg_order in land_rows:
+                # Ensure the shipping cost input for the area exists:
+                if cost_for_avg_order == 0:
+                    missing_inputs.append((area, location))
+                else:
+                    # Number of orders = annual forecast / avg order size
+                    # Convert shipping cost input to cost per unit per mile:
+                    cost_per_unit_per_mile = cost_for_avg_order / int(order_size_vec[row])
+                    total_land_shipping_cost += distance * cost_per_unit_per_mile * annual_forecast_by_area[row]
+
+    return total_sea_shipping_cost, float(total_land_shipping_cost), missing_inputs
+
+aggregates = compute_aggregates(
+    served_mask,
+    is_main,
+    sqrt_lt_vec,
+    forecast_matrix, annual_forecast_by_area, std_daily_demand_vec, daily_demand_vec, layout_type, Z_value,
+)
 
 # =============================================================================
 # Rental Cost Calculation
 # =============================================================================
-st.markdown("<p class='subheader-font'>Rental Cost Calculation</p>", unsafe_allow_html=True)
-if st.button("Calculate Rental Costs"):
-    total_rental_cost = 0.0
-    for wh in warehouse_data:
-        rent_method = wh["rent_pricing_method"]
-        rent_price = wh["rent_price"]
-        wh_type = wh["type"]
-        
-        if rent_method == "Fixed Rent Price":
-            wh_rental_cost = rent_price
-            wh_area = 0.0
-        else:
-            if wh_type == "MAIN":
-                max_monthly = compute_max_monthly_forecast(wh)
-                safety_stock_main = compute_safety_stock_main(wh, layout_type)
-                total_units = max_monthly + safety_stock_main
-                wh_rental_cost = rent_price * sq_ft_per_unit * overhead_factor_main * total_units
-                wh_area = wh_rental_cost / rent_price
-            else:
-                max_monthly = compute_max_monthly_forecast(wh)
-                daily_sum = compute_daily_demand_sum(wh)
-                total_units = (max_monthly / 4.0) + (daily_sum * 12.0)
-                wh_rental_cost = rent_price * sq_ft_per_unit * overhead_factor_front * total_units
-                wh_area = wh_rental_cost / rent_price
-        
-        wh["rental_cost"] = wh_rental_cost
-        wh["rental_area"] = wh_area
-        total_rental_cost += wh_rental_cost
-    
-    st.subheader("Rental Cost Results")
-    for i, wh in enumerate(warehouse_data):
-        st.write(f"**Warehouse {i+1}** - Location: {wh['location']}")
-        st.write(f"Type: {wh['type']}")
-        st.write(f"Pricing Method: {wh['rent_pricing_method']}")
-        st.write(f"Annual Rental Cost: ${wh['rental_cost']:.2f}")
-        if wh["rent_pricing_method"] == "Square Foot Rent Price":
-            st.write(f"Calculated Warehouse Area (sq ft): {wh['rental_area']:.2f}")
-        st.write("---")
-    st.write(f"**Total Rental Cost for All Warehouses:** ${total_rental_cost:.2f}")
+# Each calculation section is an st.fragment, so clicking its button reruns
+# only that section instead of the whole script. Inputs are passed explicitly;
+# a fragment rerun reuses the arguments from the last full script run.
+@st.fragment
+def rental_section(warehouse_data, aggregates, sq_ft_per_unit, overhead_factor_main, overhead_factor_front):
+    st.subheader("Rental Cost Calculation")
+    if st.button("Calculate Rental Costs"):
+        warehouse_rows = tuple(
+            (wh["rent_pricing_method"] == "Fixed Rent Price", wh["rent_price"]) for wh in warehouse_data
+        )
+        rental_cost, rental_area = compute_rental_costs(
+            warehouse_rows, aggregates, sq_ft_per_unit, overhead_factor_main, overhead_factor_front
+        )
+        for wh, wh_rental_cost, wh_area in zip(warehouse_data, rental_cost, rental_area):
+            wh["rental_cost"] = wh_rental_cost
+            wh["rental_area"] = wh_area
+        total_rental_cost = sum(rental_cost)
+
+        st.subheader("Rental Cost Results")
+        # One table instead of several st.write calls per warehouse.
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Warehouse": i + 1,
+                        "Location": wh["location"],
+                        "Type": wh["type"],
+                        "Pricing Method": wh["rent_pricing_method"],
+                        "Annual Rental Cost": wh["rental_cost"],
+                        "Calculated Warehouse Area (sq ft)": (
+                            wh["rental_area"] if wh["rent_pricing_method"] == "Square Foot Rent Price" else None
+                        ),
+                    }
+                    for i, wh in enumerate(warehouse_data)
+                ]
+            ),
+            hide_index=True,
+            column_config={
+                "Annual Rental Cost": st.column_config.NumberColumn(format="$%.2f"),
+                "Calculated Warehouse Area (sq ft)": st.column_config.NumberColumn(format="%.2f"),
+            },
+        )
+        st.write(f"**Total Rental Cost for All Warehouses:** ${total_rental_cost:.2f}")
+
+rental_section(warehouse_data, aggregates, sq_ft_per_unit, overhead_factor_main, overhead_factor_front)
 
 # =============================================================================
 # Inventory Financing Calculation (UPDATED FORMULA)
 # =============================================================================
-st.markdown("<p class='subheader-font'>Inventory Financing Calculation</p>", unsafe_allow_html=True)
-if st.button("Calculate Inventory Financing"):
-    financing_cost = 0.0
-    total_avg_inventory = 0.0
-    total_safety_stock = 0.0
-
-    if layout_type == "Central and Fronts":
-        main_wh = next((wh for wh in warehouse_data if wh["type"] == "MAIN"), None)
-        if main_wh is None:
+@st.fragment
+def inventory_financing_section(mains, aggregates, layout_type, interest_rate, unit_cost):
+    st.subheader("Inventory Financing Calculation")
+    if st.button("Calculate Inventory Financing"):
+        if layout_type == "Central and Fronts" and not mains:
             st.error("No MAIN warehouse found for 'Central and Fronts' layout.")
-        else:
-            safety_stock_main = compute_safety_stock_main(main_wh, layout_type)
-            annual_demand = 0.0
-            for area in main_wh["served_markets"]:
-                if area in market_area_data:
-                    annual_demand += sum(market_area_data[area]["forecast_demand"])
-            avg_inventory = (annual_demand / 12.0) + safety_stock_main
-            financing_cost = avg_inventory * 1.08 * (interest_rate / 100.0) * unit_cost
-            total_avg_inventory = avg_inventory
-            total_safety_stock = safety_stock_main
-
-    elif layout_type == "Main Regionals":
-        overall_avg_inventory = 0.0
-        overall_safety_stock = 0.0
-        for wh in warehouse_data:
-            if wh["type"] == "MAIN":
-                safety_stock_main = compute_safety_stock_main(wh, layout_type)
-                annual_demand_wh = 0.0
-                for area in wh["served_markets"]:
-                    if area in market_area_data:
-                        annual_demand_wh += sum(market_area_data[area]["forecast_demand"])
-                avg_inventory_wh = (annual_demand_wh / 12.0) + safety_stock_main
-                overall_avg_inventory += avg_inventory_wh
-                overall_safety_stock += safety_stock_main
-        total_avg_inventory = overall_avg_inventory
-        total_safety_stock = overall_safety_stock
-        financing_cost = overall_avg_inventory * 1.08 * (interest_rate / 100.0) * unit_cost
-
-    st.subheader("Inventory Financing Results")
-    st.write(f"Total Safety Stock: {total_safety_stock:.2f} units")
-    st.write(f"Average Inventory Level: {total_avg_inventory:.2f} units")
-    st.write(f"Inventory Financing Cost (per year): ${financing_cost:.2f}")
+        total_safety_stock, total_avg_inventory, financing_cost = compute_inventory_financing(
+            aggregates, layout_type, interest_rate, unit_cost
+        )
+
+        st.subheader("Inventory Financing Results")
+        st.write(f"Total Safety Stock: {total_safety_stock:.2f} units")
+        st.write(f"Average Inventory Level: {total_avg_inventory:.2f} units")
+        st.write(f"Inventory Financing Cost (per year): ${financing_cost:.2f}")
+
+inventory_financing_section(mains, aggregates, layout_type, interest_rate, unit_cost)
 
 # =============================================================================
 # Shipping (Transportation) Cost Calculation
 # =============================================================================
-st.markdown("<p class='subheader-font'>Shipping Cost Calculation</p>", unsafe_allow_html=True)
-
-container_capacity_40 = st.number_input(
-    "Container Capacity for 40ft HC (s, default 600)",
-    min_value=0,
-    value=600,
-    step=1,
-    format="%d"
-)
+@st.fragment
+def shipping_section(mains, fronts, area_index, annual_forecast_by_area, order_size_vec, layout_type):
+    st.subheader("Shipping Cost Calculation")
 
-if st.button("Calculate Shipping Costs"):
-    total_sea_shipping_cost = 0.0
-    total_land_shipping_cost = 0.0
+    container_capacity_40 = st.number_input(
+        "Container Capacity for 40ft HC (s, default 600)",
+        min_value=0,
+        value=600,
+        step=1,
+        format="%d"
+    )
 
-    # --- Sea Shipping Cost ---
-    if layout_type in ["Central and Fronts", "Main Regionals"]:
-        if layout_type == "Central and Fronts":
-            main_wh = next((wh for wh in warehouse_data if wh["type"] == "MAIN"), None)
-            if main_wh is None:
-                st.error("No MAIN warehouse found for shipping cost calculation (Central & Fronts).")
-            else:
-                for area in main_wh["served_markets"]:
-                    if area in market_area_data:
-                        annual_forecast = sum(market_area_data[area]["forecast_demand"])
-                        containers = annual_forecast / container_capacity_40
-                        total_sea_shipping_cost += containers * main_wh["shipping_cost_40hc"]
-        elif layout_type == "Main Regionals":
-            for wh in warehouse_data:
-                if wh["type"] == "MAIN":
-                    wh_sea_cost = 0.0
-                    for area in wh["served_markets"]:
-                        if area in market_area_data:
-                            annual_forecast = sum(market_area_data[area]["forecast_demand"])
-                            containers = annual_forecast / container_capacity_40
-                            wh_sea_cost += containers * wh["shipping_cost_40hc"]
-                    total_sea_shipping_cost += wh_sea_cost
+    if st.button("Calculate Shipping Costs"):
+        if layout_type == "Central and Fronts" and not mains:
+            st.error("No MAIN warehouse found for shipping cost calculation (Central & Fronts).")
+        main_rows = []
+        for wh, rows in mains:
+            land_rows = ()
+            if len(wh["served_markets"]) > 1:
+                # Additional markets beyond the first; a missing input is passed as a zero
+                # cost, which the calculation reports as missing.
+                land_shipping_data = wh.get("land_shipping_data", {})
+                land_rows = tuple(
+                    (
+                        area,
+                        area_index[area],
+                        land_shipping_data.get(area, {}).get("distance", 0.0),
+                        land_shipping_data.get(area, {}).get("cost_for_avg_order_per_mile", 0.0),
+                    )
+                    for area in wh["served_markets"][1:]
+                    if area in area_index
+                )
+            main_rows.append((wh["location"], rows, wh["shipping_cost_40hc"], land_rows))
+        front_rows = tuple(
+            (rows, wh["front_shipping_cost_40"], wh["front_shipping_cost_53"])
+            for wh, rows in fronts
+        )
+        total_sea_shipping_cost, total_land_shipping_cost, missing_inputs = compute_shipping_costs(
+            tuple(main_rows), front_rows, annual_forecast_by_area, order_size_vec, layout_type, container_capacity_40
+        )
+        for area, location in missing_inputs:
+            st.error(f"Missing shipping cost input for average order for area {area} in warehouse {location}.")
 
-    # --- Land Shipping Cost ---
-    if layout_type == "Central and Fronts":
-        # For each FRONT warehouse:
-        for wh in warehouse_data:
-            if wh["type"] == "FRONT":
-                warehouse_land_cost = 0.0
-                for m in range(12):
-                    monthly_forecast = 0.0
-                    for area in wh["served_markets"]:
-                        if area in market_area_data:
-                            monthly_forecast += market_area_data[area]["forecast_demand"][m]
-                    weekly_demand = monthly_forecast / 4.0
-                    cost_40_unit = wh["front_shipping_cost_40"] / container_capacity_40
-                    cost_53_unit = wh["front_shipping_cost_53"] / (container_capacity_40 * 1.37)
-                    avg_cost_unit = (cost_40_unit + cost_53_unit) / 2.0
-                    normalized_cost = avg_cost_unit / 0.85
-                    weekly_shipping_cost = weekly_demand * normalized_cost
-                    warehouse_land_cost += weekly_shipping_cost * 4
-                total_land_shipping_cost += warehouse_land_cost
-    elif layout_type == "Main Regionals":
-        # For each MAIN warehouse serving multiple markets:
-        for wh in warehouse_data:
-            if wh["type"] == "MAIN" and len(wh["served_markets"]) > 1:
-                additional_data = wh.get("land_shipping_data", {})
-                for area in wh["served_markets"][1:]:
-                    if area in market_area_data:
-                        # Ensure the shipping cost input for the area exists:
-                        if area not in additional_data or additional_data[area]["cost_for_avg_order_per_mile"] == 0:
-                            st.error(f"Missing shipping cost input for average order for area {area} in warehouse {wh['location']}.")
-                        else:
-                            annual_forecast = sum(market_area_data[area]["forecast_demand"])
-                            avg_size = market_area_data[area]["avg_order_size"]
-                            # Number of orders = annual_forecast / avg_size
-                            # Convert shipping cost input to cost per unit per mile:
-                            cost_for_avg_order = additional_data[area]["cost_for_avg_order_per_mile"]
-                            cost_per_unit_per_mile = cost_for_avg_order / avg_size
-                            distance = additional_data[area]["distance"]
-                            area_land_cost = distance * cost_per_unit_per_mile * annual_forecast
-                            total_land_shipping_cost += area_land_cost
-
-    total_shipping_cost = total_sea_shipping_cost + total_land_shipping_cost
-
-    st.subheader("Shipping Cost Results")
-    st.write(f"Sea Shipping Cost: ${total_sea_shipping_cost:.2f}")
-    st.write(f"Land Shipping Cost: ${total_land_shipping_cost:.2f}")
-    st.write(f"Total Shipping Cost (per year): ${total_shipping_cost:.2f}")
+        total_shipping_cost = total_sea_shipping_cost + total_land_shipping_cost
+
+        st.subheader("Shipping Cost Results")
+        st.write(f"Sea Shipping Cost: ${total_sea_shipping_cost:.2f}")
+        st.write(f"Land Shipping Cost: ${total_land_shipping_cost:.2f}")
+        st.write(f"Total Shipping Cost (per year): ${total_shipping_cost:.2f}")
+
+shipping_section(mains, fronts, area_index, annual_forecast_by_area, order_size_vec, layout_type)
 
 # =============================================================================
 # Labor Cost Calculation
 # =============================================================================
-st.markdown("<p class='subheader-font'>Labor Cost Calculation</p>", unsafe_allow_html=True)
-if st.button("Calculate Labor Costs"):
-    total_labor_cost = 0.0
-    for wh in warehouse_data:
-        labor_cost = wh["avg_employee_salary"] * wh["num_employees"]
-        wh["labor_cost"] = labor_cost
-        total_labor_cost += labor_cost
-    st.subheader("Labor Cost Results")
-    for i, wh in enumerate(warehouse_data):
-        st.write(f"**Warehouse {i+1}** - Location: {wh['location']}")
-        st.write(f"Type: {wh['type']}")
-        st.write(f"Number of Employees: {wh['num_employees']}")
-        st.write(f"Average Annual Salary: ${wh['avg_employee_salary']}")
-        st.write(f"Annual Labor Cost: ${wh['labor_cost']}")
-        st.write("---")
-    st.write(f"**Total Labor Cost for All Warehouses:** ${total_labor_cost}")
+@st.fragment
+def labor_section(warehouse_data):
+    st.subheader("Labor Cost Calculation")
+    if st.button("Calculate Labor Costs"):
+        total_labor_cost = 0.0
+        for wh in warehouse_data:
+            labor_cost = wh["avg_employee_salary"] * wh["num_employees"]
+            wh["labor_cost"] = labor_cost
+            total_labor_cost += labor_cost
+        st.subheader("Labor Cost Results")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Warehouse": i + 1,
+                        "Location": wh["location"],
+                        "Type": wh["type"],
+                        "Number of Employees": wh["num_employees"],
+                        "Average Annual Salary": wh["avg_employee_salary"],
+                        "Annual Labor Cost": wh["labor_cost"],
+                    }
+                    for i, wh in enumerate(warehouse_data)
+                ]
+            ),
+            hide_index=True,
+            column_config={
+                "Average Annual Salary": st.column_config.NumberColumn(format="$%d"),
+                "Annual Labor Cost": st.column_config.NumberColumn(format="$%d"),
+            },
+        )
+        st.write(f"**Total Labor Cost for All Warehouses:** ${total_labor_cost}")
+
+labor_section(warehouse_data)
 
 # =============================================================================
 # Submission
@@ -527,5 +693,7 @@ if st.button("Submit Data"):
         "layout_type": layout_type,
         "unit_cost": f"${unit_cost}"
     })
-    st.write("Market Area Data:", market_area_data)
-    st.write("Warehouse Data:", warehouse_data)
+    st.write("Market Area Data:")
+    st.json(market_area_data, expanded=False)
+    st.write("Warehouse Data:")
+    st.json(warehouse_data, expanded=False)